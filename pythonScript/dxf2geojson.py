@@ -5,25 +5,31 @@ License: MIT
 """
 
 import os
+import io
+import gzip
 import sys
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from functools import lru_cache
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import math
+from itertools import chain
 
+import numpy as np
 import ezdxf
+from ezdxf import recover
+from ezdxf.addons import iterdxf
 from ezdxf.document import Drawing
 from ezdxf.entities import DXFEntity
-import geopandas as gpd
-from shapely.geometry import Point, LineString, Polygon, MultiPolygon, shape
-from shapely.ops import orient
 from pyproj import Transformer
-import geojson
-import json
-from shapely.geometry import mapping
+from pyproj.network import set_network_enabled
+import orjson
 
 # 定数定義
 DEFAULT_EPSG = 6677  # 東京を含む第9系
@@ -32,6 +38,10 @@ OUTPUT_CRS_OPTIONS = {
     "WGS84 (EPSG:4326)": "EPSG:4326"
 }
 SUPPORTED_ENTITIES = {"POINT", "LWPOLYLINE", "POLYLINE", "CIRCLE", "ARC", "LINE"}
+DUPLICATE_TOLERANCE = 1e-8  # 同一頂点とみなす座標差
+STREAMING_THRESHOLD = 50 * 1024 * 1024  # この容量以上のDXFは逐次読み込み（50 MiB）
+TRANSFORM_CHUNK_SIZE = 100_000  # 座標変換から書き出しまでを一度に流すフィーチャ数
+OUTPUT_BUFFER_SIZE = 1 << 20  # GeoJSON書き出し時のバッファサイズ（1 MiB）
 
 #########################
 # ログ設定
@@ -68,7 +78,7 @@ def setup_logging() -> None:
         logger.addHandler(console_handler)
         
         logging.info("=== DXF to GeoJSON Converter ===")
-        logging.info(f"ログファイル: {log_file}")
+        logging.info("ログファイル: %s", log_file)
         
     except Exception as e:
         print(f"ログ設定エラー: {str(e)}")
@@ -102,40 +112,40 @@ class EPSGSelector:
         19: (6687, "東京都の一部（南方諸島）")
     }
 
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("座標系選択")
+    def __init__(self, parent: tk.Misc):
+        self.top = tk.Toplevel(parent)
+        self.top.title("座標系選択")
         self.selected_epsg = DEFAULT_EPSG
         self._setup_ui()
 
     def _setup_ui(self) -> None:
         """GUIコンポーネントの初期化"""
-        frame = ttk.Frame(self.root, padding=10)
+        frame = ttk.Frame(self.top, padding=10)
         frame.grid(row=0, column=0, sticky=tk.NSEW)
 
         label = ttk.Label(frame, text="DXFファイルの平面直角座標系を選択してください:")
         label.grid(row=0, column=0, sticky=tk.W, pady=5)
 
-        # 表示用の選択肢を作成
+        # 表示用の選択肢を作成（選択位置と系番号を対応付けて保持）
+        self._option_codes = list(self.EPSG_OPTIONS.keys())
         options = [f"第{code}系: {desc}" for code, (_, desc) in self.EPSG_OPTIONS.items()]
-        self.combo_var = tk.StringVar(value=options[8])  # デフォルト第9系
-        combo = ttk.Combobox(frame, textvariable=self.combo_var, values=options, 
-                           state="readonly", width=60)
-        combo.grid(row=1, column=0, padx=5, pady=5)
+        self.combo_var = tk.StringVar(self.top, value=options[8])  # デフォルト第9系
+        self.combo = ttk.Combobox(frame, textvariable=self.combo_var, values=options, 
+                                  state="readonly", width=60)
+        self.combo.grid(row=1, column=0, padx=5, pady=5)
 
         ttk.Button(frame, text="OK", command=self._on_ok).grid(row=2, column=0, pady=10)
 
     def _on_ok(self) -> None:
         """OKボタン処理"""
-        selected = self.combo_var.get()
-        # "第X系: 説明" から系番号を取得
-        system_number = int(selected.split("第")[1].split("系")[0])
+        # 選択位置から系番号を取得
+        system_number = self._option_codes[self.combo.current()]
         self.selected_epsg = self.EPSG_OPTIONS[system_number][0]  # EPSGコードを取得
-        self.root.destroy()
+        self.top.destroy()
 
     def get_epsg(self) -> int:
         """選択されたEPSGコードを取得"""
-        self.root.mainloop()
+        self.top.wait_window()
         return self.selected_epsg
 
 #########################
@@ -144,258 +154,303 @@ class EPSGSelector:
 class OutputCRSSelector:
     """出力座標系選択ダイアログ"""
     
-    def __init__(self, input_epsg: str):
+    def __init__(self, input_epsg: str, parent: tk.Misc):
         self.input_epsg = input_epsg
+        self.parent = parent
         self.crs_options = {
             "WGS84 (EPSG:4326)": "EPSG:4326",
             "Web Mercator (EPSG:3857)": "EPSG:3857",
             f"入力座標系 (EPSG:{input_epsg})": f"EPSG:{input_epsg}"
         }
         self.default_crs = "EPSG:4326"
+        self.force_2d = False  # Z座標を出力しない（2次元で出力）
+        self.compress = False  # gzip圧縮して出力
 
     def get_crs(self) -> str:
-        # メインウィンドウ作成
-        root = tk.Tk()
-        root.title("出力座標系の選択")
-        root.geometry("300x200")
-
-        selected_crs = tk.StringVar(value=self.default_crs)
+        # ダイアログ作成（メインウィンドウは共有）
+        top = tk.Toplevel(self.parent)
+        top.title("出力座標系の選択")
+        top.geometry("300x270")
+
+        selected_crs = tk.StringVar(top, value=self.default_crs)
+        force_2d_var = tk.BooleanVar(top, value=self.force_2d)
+        compress_var = tk.BooleanVar(top, value=self.compress)
+        selected = self.default_crs
+
+        def on_ok() -> None:
+            nonlocal selected
+            selected = selected_crs.get()
+            self.force_2d = force_2d_var.get()
+            self.compress = compress_var.get()
+            top.destroy()
 
         # ラジオボタン作成
-        label = tk.Label(root, text="出力座標系を選択してください：")
+        label = tk.Label(top, text="出力座標系を選択してください：")
         label.pack(pady=10)
 
         for text, crs in self.crs_options.items():
             rb = tk.Radiobutton(
-                root,
+                top,
                 text=text,
                 value=crs,
                 variable=selected_crs
             )
             rb.pack(anchor=tk.W, padx=20)
 
+        # 出力オプション
+        cb = tk.Checkbutton(
+            top,
+            text="Z座標を出力しない（2次元）",
+            variable=force_2d_var
+        )
+        cb.pack(anchor=tk.W, padx=20, pady=(10, 0))
+        cb = tk.Checkbutton(
+            top,
+            text="gzip圧縮して出力（.geojson.gz）",
+            variable=compress_var
+        )
+        cb.pack(anchor=tk.W, padx=20)
+
         # OKボタン
         ok_button = tk.Button(
-            root,
+            top,
             text="OK",
-            command=root.quit
+            command=on_ok
         )
         ok_button.pack(pady=10)
 
         # ウィンドウを中央に配置
-        root.update_idletasks()
-        width = root.winfo_width()
-        height = root.winfo_height()
-        x = (root.winfo_screenwidth() // 2) - (width // 2)
-        y = (root.winfo_screenheight() // 2) - (height // 2)
-        root.geometry(f"{width}x{height}+{x}+{y}")
-
-        # メインループ
-        root.mainloop()
-        
-        selected = selected_crs.get()
-        root.destroy()
+        top.update_idletasks()
+        width = top.winfo_width()
+        height = top.winfo_height()
+        x = (top.winfo_screenwidth() // 2) - (width // 2)
+        y = (top.winfo_screenheight() // 2) - (height // 2)
+        top.geometry(f"{width}x{height}+{x}+{y}")
+
+        # ダイアログが閉じられるまで待機
+        top.wait_window()
         
         return selected
 
 #########################
 # DXF処理モジュール
 #########################
+def _compact_ring(coords: np.ndarray, tol: float, close: bool):
+    """重複頂点の除去・リングのクローズ・高さ統計の計算"""
+    # 直前の頂点と比較して重複を除去
+    keep = np.concatenate((
+        [True],
+        np.max(np.abs(np.diff(coords, axis=0)), axis=1) >= tol
+    ))
+    out = coords[keep]
+
+    if close and len(out) >= 3:
+        if np.max(np.abs(out[0] - out[-1])) >= tol:
+            out = np.vstack([out, out[:1]])
+
+    z_values = out[:, 2]
+    return out, z_values.min(), z_values.max(), z_values.mean()
+
+def _orient_exterior(ring: np.ndarray) -> np.ndarray:
+    """外周リングを反時計回り（RFC 7946 の右手の法則）に揃える"""
+    x = ring[:, 0]
+    y = ring[:, 1]
+    # 符号付き面積（の2倍）が負なら時計回り
+    if np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]) < 0:
+        return np.ascontiguousarray(ring[::-1])
+    return ring
+
 class DXFProcessor:
     """DXFファイルの読み込みとジオメトリ変換"""
     
-    def __init__(self, dxf_path: str):
+    def __init__(self, dxf_path: str, force_2d: bool = False):
         self.dxf_path = dxf_path
-        self.doc: Drawing = ezdxf.readfile(dxf_path)
-        self.msp = self.doc.modelspace()
+        self.force_2d = force_2d  # Trueの場合はZ座標を出力しない
+        self.doc: Optional[Drawing] = None
+        self.msp = None
         self.features: List[Dict[str, Any]] = []
+        # 大容量ファイルはDrawingを構築せず、process() でモデル空間を逐次読み込む
+        self.streaming = os.path.getsize(dxf_path) >= STREAMING_THRESHOLD
+        if not self.streaming:
+            self._load_document()
 
-    def _process_entity(self, entity: DXFEntity) -> None:
-        """個々のDXFエンティティを処理"""
+    def _load_document(self) -> None:
+        """DXFファイル全体を読み込み"""
         try:
-            dxftype = entity.dxftype()
-            if dxftype not in SUPPORTED_ENTITIES:
-                return
+            self.doc = ezdxf.readfile(self.dxf_path)
+        except ezdxf.DXFStructureError as e:
+            # 構造エラーのあるファイルのみ修復モード（監査付き）で読み込む
+            logging.warning("DXF構造エラーのため修復モードで読み込みます: %s - %s", self.dxf_path, e)
+            self.doc, _ = recover.readfile(self.dxf_path)
+        self.msp = self.doc.modelspace()
 
-            geom = None
-            prop = {
-                "layer": entity.dxf.layer,
-                "color": entity.dxf.color,
-                "dxftype": dxftype
-            }
+    def _group_entities(self) -> Dict[str, List[DXFEntity]]:
+        """対象エンティティを1回の走査でタイプ別に分類"""
+        if self.streaming:
+            try:
+                return self._group_streamed_entities()
+            except ezdxf.DXFStructureError as e:
+                logging.warning("逐次読み込みできないため通常の読み込みに切り替えます: %s - %s", self.dxf_path, e)
+                self.streaming = False
+                self._load_document()
+
+        return self.msp.query(" ".join(sorted(SUPPORTED_ENTITIES))).groupby(
+            key=lambda entity: entity.dxftype()
+        )
 
-            if dxftype == "POINT":
-                geom = self._extract_point(entity)
-                if geom:
-                    self.features.append({
-                        "type": "Feature",
-                        "geometry": mapping(geom),
-                        "properties": prop
-                    })
-            elif dxftype in {"LWPOLYLINE", "POLYLINE"}:
-                feature = self._extract_polyline(entity)
-                if feature:
-                    self.features.append(feature)
-            elif dxftype == "LINE":
-                geom = self._extract_line(entity)
-                if geom:
-                    self.features.append({
-                        "type": "Feature",
-                        "geometry": mapping(geom),
-                        "properties": prop
-                    })
-            elif dxftype in {"CIRCLE", "ARC"}:
-                feature = self._extract_curve(entity)
-                if feature:
-                    self.features.append(feature)
+    def _group_streamed_entities(self) -> Dict[str, List[DXFEntity]]:
+        """モデル空間のエンティティを逐次読み込みしながらタイプ別に分類"""
+        groups: Dict[str, List[DXFEntity]] = {}
+        doc = iterdxf.opendxf(self.dxf_path)
+        try:
+            for entity in doc.modelspace(types=SUPPORTED_ENTITIES):
+                groups.setdefault(entity.dxftype(), []).append(entity)
+        finally:
+            doc.close()
+        return groups
 
-        except Exception as e:
-            logging.error(f"エンティティ処理エラー: {str(e)}")
+    def _process_entity(self, extractor, entity: DXFEntity) -> Optional[Dict[str, Any]]:
+        """個々のDXFエンティティを処理"""
+        try:
+            return extractor(self, entity)
 
-    def _extract_point(self, entity) -> Point:
-        """POINTエンティティの抽出"""
-        loc = entity.dxf.location
-        return Point(loc.x, loc.y, loc.z)
+        except Exception as e:
+            logging.error("エンティティ処理エラー: %s", e)
+            return None
 
     def _extract_polyline(self, entity) -> Optional[Dict[str, Any]]:
         """POLYLINE/LWPOLYLINE処理"""
         try:
-            coords_3d = []
+            coords = np.empty((0, 3), dtype=np.float64)
             dxftype = entity.dxftype()
-            logging.info(f"[高さ追跡] 処理開始: エンティティタイプ = {dxftype}")
-
-            # エンティティの基準高さを取得
-            base_elevation = 0.0
-            if hasattr(entity.dxf, 'elevation'):
-                if isinstance(entity.dxf.elevation, (int, float)):
-                    base_elevation = float(entity.dxf.elevation)
-                elif hasattr(entity.dxf.elevation, 'z'):
-                    base_elevation = float(entity.dxf.elevation.z)
-                elif isinstance(entity.dxf.elevation, (list, tuple)):
-                    base_elevation = float(entity.dxf.elevation[2])  # Z座標を取得
-            logging.info(f"[高さ追跡] 基準高さ: {base_elevation}")
-
-            # POLYLINE/LWPOLYLINEの処理
+            dxf = entity.dxf
+            logging.debug("[高さ追跡] 処理開始: エンティティタイプ = %s", dxftype)
+
+            # エンティティの基準高さを取得（LWPOLYLINEは数値、POLYLINEは(x, y, z)）
+            elevation = getattr(dxf, 'elevation', 0.0)
+            try:
+                base_elevation = float(elevation)
+            except TypeError:
+                base_elevation = float(elevation[2])  # Z座標を取得
+            logging.debug("[高さ追跡] 基準高さ: %s", base_elevation)
+
+            # POLYLINE/LWPOLYLINEの処理（頂点ごとのdxf属性参照を避けて一括取得）
             if dxftype == "LWPOLYLINE":
-                for point in entity.get_points():
-                    x, y = point[:2]
-                    # 高さ情報を取得（bulge情報がある場合は除外）
-                    z = point[2] if len(point) > 2 and not isinstance(point[2], (bool, int)) else base_elevation
-                    coords_3d.append([float(x), float(y), float(z)])
-                    logging.info(f"[高さ追跡] LWPOLYLINE頂点: x={x}, y={y}, z={z}")
-            
+                # 頂点データ (x, y, start_width, end_width, bulge) からX, Yを取り出し、
+                # Z座標にはエンティティの基準高さを設定
+                points = np.asarray(entity.lwpoints.values, dtype=np.float64).reshape(-1, 5)
+                coords = np.empty((len(points), 3), dtype=np.float64)
+                coords[:, :2] = points[:, :2]
+                coords[:, 2] = base_elevation
             elif dxftype == "POLYLINE":
-                for vertex in entity.vertices:
-                    if not hasattr(vertex.dxf, 'location'):
-                        continue
-                    loc = vertex.dxf.location
-                    x = float(loc.x)
-                    y = float(loc.y)
-                    # Z座標の取得を試みる（複数の方法）
-                    if hasattr(loc, 'z'):
-                        z = float(loc.z)
-                    elif hasattr(vertex.dxf, 'elevation'):
-                        z = float(vertex.dxf.elevation)
-                    else:
-                        z = base_elevation
-                    coords_3d.append([x, y, z])
-                    logging.info(f"[高さ追跡] POLYLINE頂点: x={x}, y={y}, z={z}")
-
-            if not coords_3d:
-                logging.warning(f"[高さ追跡] 有効な座標が取得できませんでした: {dxftype}")
+                # 頂点数から(N, 3)配列を確保して埋める
+                coords = np.fromiter(
+                    chain.from_iterable(entity.points()),
+                    dtype=np.float64,
+                    count=3 * len(entity.vertices)
+                ).reshape(-1, 3)
+
+            # 頂点ごとのログはDEBUG有効時のみ出力
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for x, y, z in coords.tolist():
+                    logging.debug("[高さ追跡] %s頂点: x=%s, y=%s, z=%s", dxftype, x, y, z)
+
+            if not len(coords):
+                logging.warning("[高さ追跡] 有効な座標が取得できませんでした: %s", dxftype)
                 return None
 
-            # 重複頂点の除去（数値誤差を考慮）
-            unique_coords = []
-            for coord in coords_3d:
-                if not unique_coords or not all(abs(a - b) < 1e-8 for a, b in zip(coord, unique_coords[-1])):
-                    unique_coords.append(coord)
-
-            # ポリゴンクローズの処理
+            # ポリゴンクローズの判定
             is_closed = False
-            if hasattr(entity.dxf, 'flags'):
-                is_closed = bool(entity.dxf.flags & 1)
+            flags = getattr(dxf, 'flags', None)
+            if flags is not None:
+                is_closed = bool(flags & 1)
             elif hasattr(entity, 'closed'):
                 is_closed = entity.closed
 
-            if is_closed and len(unique_coords) >= 3:
-                if not all(abs(a - b) < 1e-8 for a, b in zip(unique_coords[0], unique_coords[-1])):
-                    unique_coords.append(unique_coords[0].copy())
-
-            # 高さの統計情報を計算
-            z_values = [coord[2] for coord in unique_coords]
+            # 重複頂点の除去（数値誤差を考慮）、リングのクローズ、高さの統計情報を計算
+            unique_coords, min_z, max_z, avg_z = _compact_ring(coords, DUPLICATE_TOLERANCE, is_closed)
             z_stats = {
-                "min_z": min(z_values),
-                "max_z": max(z_values),
-                "avg_z": sum(z_values) / len(z_values)
+                "min_z": float(min_z),
+                "max_z": float(max_z),
+                "avg_z": float(avg_z)
             }
             
-            # GeoJSON Feature の作成
+            # GeoJSON Feature の作成（閉じたリングは反時計回りのPolygon外周とする）
+            unique_coords = self._fit_dim(unique_coords)
+            if is_closed and len(unique_coords) >= 4:
+                geometry = {"type": "Polygon", "coordinates": [_orient_exterior(unique_coords)]}
+            else:
+                geometry = {"type": "LineString", "coordinates": unique_coords}
+
             feature = {
                 "type": "Feature",
-                "geometry": {
-                    "type": "Polygon" if is_closed and len(unique_coords) >= 4 else "LineString",
-                    "coordinates": [unique_coords] if is_closed and len(unique_coords) >= 4 else unique_coords
-                },
+                "geometry": geometry,
                 "properties": {
-                    "layer": str(entity.dxf.layer),
-                    "color": int(entity.dxf.color),
+                    "layer": str(dxf.layer),
+                    "color": int(dxf.color),
                     "dxftype": str(dxftype),
                     "elevation": base_elevation,
                     **z_stats
                 }
             }
 
-            logging.info(f"[高さ追跡] フィーチャ作成完了: {z_stats}")
+            logging.info("[高さ追跡] フィーチャ作成完了: %s", z_stats)
             return feature
 
         except Exception as e:
-            logging.error(f"[高さ追跡] ポリライン処理エラー: {str(e)}")
+            logging.error("[高さ追跡] ポリライン処理エラー: %s", e)
             import traceback
             logging.error(traceback.format_exc())
             return None
 
-    def _extract_line(self, entity) -> LineString:
-        """LINEエンティティ処理"""
-        start = entity.dxf.start
-        end = entity.dxf.end
-        return LineString([(start.x, start.y, start.z), (end.x, end.y, end.z)])
+    def _fit_dim(self, coords: np.ndarray) -> np.ndarray:
+        """force_2d指定時は(N, 3)座標配列からZ座標を除去"""
+        if self.force_2d:
+            return np.ascontiguousarray(coords[:, :2])
+        return coords
+
+    @staticmethod
+    def _curve_points(center, radius: float, start_angle: float, end_angle: float,
+                      num_points: int) -> np.ndarray:
+        """円弧上の num_points + 1 点を(N, 3)配列として一括計算"""
+        angles = np.linspace(start_angle, end_angle, num_points + 1)
+        xs = center.x + radius * np.cos(angles)
+        ys = center.y + radius * np.sin(angles)
+        zs = np.full_like(xs, center.z)
+        return np.stack([xs, ys, zs], axis=1)
 
     def _extract_curve(self, entity) -> Optional[Dict[str, Any]]:
         """CIRCLE/ARCエンティティの処理"""
         try:
             dxftype = entity.dxftype()
-            center = entity.dxf.center
-            radius = entity.dxf.radius
+            dxf = entity.dxf
+            center = dxf.center
+            radius = dxf.radius
+            layer = str(dxf.layer)
+            color = int(dxf.color)
             
             if dxftype == "CIRCLE":
                 # 円を近似する点の数（精度）
                 num_points = 32
-                points = []
-                for i in range(num_points + 1):
-                    angle = (i * 2 * math.pi) / num_points
-                    x = center.x + radius * math.cos(angle)
-                    y = center.y + radius * math.sin(angle)
-                    z = center.z
-                    points.append([x, y, z])
+                points = self._curve_points(center, radius, 0.0, 2 * math.pi, num_points)
                 
                 return {
                     "type": "Feature",
                     "geometry": {
                         "type": "Polygon",
-                        "coordinates": [points]
+                        "coordinates": [self._fit_dim(points)]
                     },
                     "properties": {
-                        "layer": str(entity.dxf.layer),
-                        "color": int(entity.dxf.color),
+                        "layer": layer,
+                        "color": color,
                         "dxftype": str(dxftype),
                         "radius": radius
                     }
                 }
                 
             elif dxftype == "ARC":
-                start_angle = math.radians(entity.dxf.start_angle)
-                end_angle = math.radians(entity.dxf.end_angle)
+                start_angle = math.radians(dxf.start_angle)
+                end_angle = math.radians(dxf.end_angle)
                 
                 # 終了角度が開始角度より小さい場合、360度を加算
                 if end_angle < start_angle:
@@ -403,165 +458,326 @@ class DXFProcessor:
                     
                 # 円弧を近似する点の数（精度）
                 num_points = 16
-                points = []
-                
-                for i in range(num_points + 1):
-                    angle = start_angle + (i * (end_angle - start_angle)) / num_points
-                    x = center.x + radius * math.cos(angle)
-                    y = center.y + radius * math.sin(angle)
-                    z = center.z
-                    points.append([x, y, z])
+                points = self._curve_points(center, radius, start_angle, end_angle, num_points)
                 
                 return {
                     "type": "Feature",
                     "geometry": {
                         "type": "LineString",
-                        "coordinates": points
+                        "coordinates": self._fit_dim(points)
                     },
                     "properties": {
-                        "layer": str(entity.dxf.layer),
-                        "color": int(entity.dxf.color),
+                        "layer": layer,
+                        "color": color,
                         "dxftype": str(dxftype),
                         "radius": radius,
-                        "start_angle": entity.dxf.start_angle,
-                        "end_angle": entity.dxf.end_angle
+                        "start_angle": dxf.start_angle,
+                        "end_angle": dxf.end_angle
                     }
                 }
                 
         except Exception as e:
-            logging.error(f"円/円弧の処理エラー: {str(e)}")
+            logging.error("円/円弧の処理エラー: %s", e)
             return None
 
+    def _add_points(self, points) -> None:
+        """POINTエンティティをまとめてフィーチャ化"""
+        try:
+            count = len(points)
+            if not count:
+                return
+            xyz = np.fromiter(
+                (point.dxf.location.xyz for point in points),
+                dtype=np.dtype((np.float64, 3)),
+                count=count
+            )
+            # Shapelyを経由せず座標配列から直接GeoJSONの座標を作成
+            coords = self._fit_dim(xyz).tolist()
+            self.features.extend(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": coord
+                    },
+                    "properties": {
+                        "layer": point.dxf.layer,
+                        "color": point.dxf.color,
+                        "dxftype": "POINT"
+                    }
+                }
+                for point, coord in zip(points, coords)
+            )
+
+        except Exception as e:
+            logging.error("POINT処理エラー: %s", e)
+
+    def _add_lines(self, lines) -> None:
+        """LINEエンティティをまとめてフィーチャ化"""
+        try:
+            count = len(lines)
+            if not count:
+                return
+            xyz = np.fromiter(
+                (line.dxf.start.xyz + line.dxf.end.xyz for line in lines),
+                dtype=np.dtype((np.float64, 6)),
+                count=count
+            ).reshape(-1, 3)
+            # Shapelyを経由せず座標配列から直接GeoJSONの座標を作成
+            coords = self._fit_dim(xyz).reshape(count, 2, -1).tolist()
+            self.features.extend(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": coord
+                    },
+                    "properties": {
+                        "layer": line.dxf.layer,
+                        "color": line.dxf.color,
+                        "dxftype": "LINE"
+                    }
+                }
+                for line, coord in zip(lines, coords)
+            )
+
+        except Exception as e:
+            logging.error("LINE処理エラー: %s", e)
+
+    # エンティティ単位で処理するタイプの抽出メソッド
+    _DISPATCH = {
+        "LWPOLYLINE": _extract_polyline,
+        "POLYLINE": _extract_polyline,
+        "CIRCLE": _extract_curve,
+        "ARC": _extract_curve
+    }
+
     def process(self) -> List[Dict[str, Any]]:
         """全エンティティの処理"""
-        logging.info(f"DXF処理開始: {self.dxf_path}")
-        for entity in self.msp:
-            self._process_entity(entity)
-        logging.info(f"抽出ジオメトリ数: {len(self.features)}")
+        logging.info("DXF処理開始: %s", self.dxf_path)
+        groups = self._group_entities()
+        # POINT/LINEはまとめて、その他はタイプごとの処理メソッドを直接呼び出す
+        self._add_points(groups.get("POINT", []))
+        self._add_lines(groups.get("LINE", []))
+        for dxftype, extractor in self._DISPATCH.items():
+            # タイプごとにまとめてextendし、1件ずつのappendを避ける
+            self.features.extend(filter(None, (
+                self._process_entity(extractor, entity)
+                for entity in groups.get(dxftype, [])
+            )))
+        logging.info("抽出ジオメトリ数: %s", len(self.features))
         return self.features
 
 #########################
 # 座標変換モジュール
 #########################
+# グリッドファイルのダウンロード待ちで変換が止まらないようネットワークを無効化
+set_network_enabled(False)
+
+@lru_cache(maxsize=16)
+def _cached_transformer(src: str, dst: str, always_xy: bool) -> Transformer:
+    """Transformerを座標系の組み合わせごとにキャッシュして取得"""
+    return Transformer.from_crs(src, dst, always_xy=always_xy)
+
 class CoordinateTransformer:
     """座標変換処理を管理"""
     
     def __init__(self, src_epsg: int, dst_crs: str):
         self.src_epsg = src_epsg
-        self.transformer = Transformer.from_crs(
-            f"EPSG:{src_epsg}", 
-            dst_crs, 
-            always_xy=True
-        )
+        # 入力座標系のまま出力する場合は座標変換を行わない
+        self._identity = (f"EPSG:{src_epsg}" == dst_crs)
+        self.transformer = None if self._identity else _cached_transformer(f"EPSG:{src_epsg}", dst_crs, True)
+
+    def transform_features(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """全フィーチャの座標を1回のpyproj呼び出しで一括変換"""
+        if self._identity:
+            return [feature for feature in features if feature and "geometry" in feature]
 
-    def transform_geometry(self, feature: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """GeoJSON形式のジオメトリを変換"""
         try:
-            if not feature or "geometry" not in feature:
-                return None
+            return self._transform_batch(features)
+        except Exception as e:
+            # 一括変換に失敗した場合は1件ずつ変換し、変換できないフィーチャのみ除外
+            logging.warning("一括座標変換に失敗したため1件ずつ変換します: %s", e)
 
-            coords = feature["geometry"]["coordinates"]
-            geom_type = feature["geometry"]["type"]
-            
+        transformed = []
+        for feature in features:
+            try:
+                transformed.extend(self._transform_batch([feature]))
+            except Exception as e:
+                logging.error("座標変換エラー: %s", e)
+        return transformed
+
+    def _transform_batch(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """フィーチャの全頂点をまとめてpyprojで変換"""
+        targets = []
+        # (フィーチャ番号, リング番号)
+        runs = []
+        ring_arrays = []
+
+        for feature in features:
+            if not feature or "geometry" not in feature:
+                continue
+            rings = self._get_rings(feature["geometry"])
+            if rings is None:
+                targets.append(feature)
+                continue
+
+            feature_idx = len(targets)
+            targets.append(feature)
+            for ring_idx, ring in enumerate(rings):
+                ring_arrays.append(self._ring_array(ring))
+                runs.append((feature_idx, ring_idx))
+
+        if not ring_arrays:
+            return targets
+
+        # 全頂点のX, Yをそれぞれ連続した配列にまとめ、その場で一括変換
+        xs = np.concatenate([arr[:, 0] for arr in ring_arrays])
+        ys = np.concatenate([arr[:, 1] for arr in ring_arrays])
+        if len(xs):
+            self.transformer.transform(xs, ys, inplace=True)
+
+        # 変換結果を各リングの配列へ直接書き戻す（Z座標はそのまま保持）
+        offsets = np.cumsum([len(arr) for arr in ring_arrays])[:-1]
+        new_rings: Dict[int, List[np.ndarray]] = {}
+        for (feature_idx, _), arr, ring_xs, ring_ys in zip(
+                runs, ring_arrays, np.split(xs, offsets), np.split(ys, offsets)):
+            arr[:, 0] = ring_xs
+            arr[:, 1] = ring_ys
+            new_rings.setdefault(feature_idx, []).append(arr)
+
+        for feature_idx, rings in new_rings.items():
+            geometry = targets[feature_idx]["geometry"]
+            geom_type = geometry["type"]
             if geom_type == "Polygon":
-                transformed_coords = []
-                for ring in coords:
-                    transformed_ring = []
-                    for coord in ring:
-                        if len(coord) != 3:
-                            continue
-                        x, y, z = coord
-                        new_x, new_y = self.transformer.transform(x, y)
-                        transformed_ring.append([new_x, new_y, z])  # Z座標を保持
-                    transformed_coords.append(transformed_ring)
-                feature["geometry"]["coordinates"] = transformed_coords
-                
+                geometry["coordinates"] = rings
             elif geom_type == "LineString":
-                transformed_coords = []
-                for coord in coords:
-                    if len(coord) != 3:
-                        continue
-                    x, y, z = coord
-                    new_x, new_y = self.transformer.transform(x, y)
-                    transformed_coords.append([new_x, new_y, z])  # Z座標を保持
-                feature["geometry"]["coordinates"] = transformed_coords
-            
-            return feature
-            
-        except Exception as e:
-            logging.error(f"座標変換エラー: {str(e)}")
-            return None
+                geometry["coordinates"] = rings[0]
+            elif geom_type == "Point" and len(rings[0]):
+                geometry["coordinates"] = rings[0][0]
+
+        return targets
+
+    def iter_transformed(self, features: List[Dict[str, Any]],
+                         chunk_size: int = TRANSFORM_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """フィーチャを一定件数ずつ一括変換し、変換済みのものから順に返す"""
+        for start in range(0, len(features), chunk_size):
+            yield from self.transform_features(features[start:start + chunk_size])
+
+    @staticmethod
+    def _ring_array(ring: Any) -> np.ndarray:
+        """座標列を(N, 2)または(N, 3)配列に変換（次元の揃わない頂点は3次元のみ採用）"""
+        try:
+            arr = np.asarray(ring, dtype=np.float64)
+        except ValueError:
+            arr = None
+        if arr is None or arr.ndim != 2 or arr.shape[1] not in (2, 3):
+            arr = np.asarray(
+                [coord for coord in ring if len(coord) == 3],
+                dtype=np.float64
+            ).reshape(-1, 3)
+        return arr
+
+    @staticmethod
+    def _get_rings(geometry: Dict[str, Any]) -> Optional[List[Any]]:
+        """ジオメトリの座標列をリング単位のリストとして取得"""
+        geom_type = geometry["type"]
+        coords = geometry["coordinates"]
+        if geom_type == "Polygon":
+            return list(coords)
+        if geom_type == "LineString":
+            return [coords]
+        if geom_type == "Point":
+            return [[coords]]
+        return None
 
 #########################
 # メイン処理
 #########################
-def process_geometry(geometry):
-    """ジオメトリの向きを修正"""
-    if isinstance(geometry, Polygon):
-        # 外側の輪を反時計回りに修正
-        coords = list(geometry.exterior.coords)
-        coords.reverse()
-        return Polygon(coords)
-    return geometry
-
-def process_dxf_file(dxf_path: str, epsg: int, output_crs: str) -> None:
-    """DXFファイルを処理"""
+def write_geojson(output_path: str, features: Iterable[Dict[str, Any]], output_crs: str,
+                  pretty: bool = False, compress: bool = False) -> None:
+    """FeatureCollectionをフィーチャ単位で逐次書き出し（compress=Trueでgzip圧縮）"""
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    separator = b',\n' if pretty else b','
+    crs = {
+        "type": "name",
+        "properties": {
+            "name": output_crs
+        }
+    }
+
+    if compress:
+        # 圧縮率より速度を優先（compresslevel=1）し、小さな書き込みはバッファでまとめる
+        f = io.BufferedWriter(gzip.open(output_path, 'wb', compresslevel=1), OUTPUT_BUFFER_SIZE)
+    else:
+        f = open(output_path, 'wb', buffering=OUTPUT_BUFFER_SIZE)
+
+    with f:
+        f.write(b'{"type":"FeatureCollection","features":[')
+        for i, feature in enumerate(features):
+            if i:
+                f.write(separator)
+            f.write(orjson.dumps(feature, option=option))
+        f.write(b'],"crs":' + orjson.dumps(crs) + b'}\n')
+
+def process_dxf_file(dxf_path: str, epsg: int, output_crs: str, pretty: bool = False,
+                     force_2d: bool = False, compress: bool = False) -> Optional[str]:
+    """DXFファイルを処理し、出力ファイルのパスを返す
+    （pretty=Trueでインデント付き出力、force_2d=Trueで2次元出力、compress=Trueでgzip圧縮出力）"""
     try:
-        processor = DXFProcessor(dxf_path)
+        processor = DXFProcessor(dxf_path, force_2d)
         features = processor.process()
         
         if not features:
             logging.warning("変換可能なジオメトリが見つかりませんでした")
-            return
+            return None
             
-        # 座標変換
+        # 座標変換（一定件数ずつ変換しながら書き出し、作業用配列を抑える）
         transformer = CoordinateTransformer(epsg, output_crs)
-        transformed_features = []
-        for feature in features:
-            transformed_feature = transformer.transform_geometry(feature)
-            if transformed_feature:
-                transformed_features.append(transformed_feature)
+        transformed_features = transformer.iter_transformed(features)
         
         # GeoJSONファイル作成
         output_path = dxf_path.rsplit('.', 1)[0] + f'_epsg{output_crs.split(":")[-1]}.geojson'
+        if compress:
+            output_path += '.gz'
         
         # GeoJSON形式で保存
-        geojson_data = {
-            "type": "FeatureCollection",
-            "features": transformed_features,
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": output_crs
-                }
-            }
-        }
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(geojson_data, f, ensure_ascii=False, indent=2)
+        write_geojson(output_path, transformed_features, output_crs, pretty, compress)
             
-        logging.info(f"出力完了: {output_path}")
+        logging.info("出力完了: %s", output_path)
+        return output_path
         
     except Exception as e:
-        logging.error(f"ファイル処理エラー: {dxf_path} - {str(e)}")
+        logging.error("ファイル処理エラー: %s - %s", dxf_path, e)
         raise
 
+def _init_worker(log_queue) -> None:
+    """ワーカープロセスの初期化（ログをメインプロセスへ転送）"""
+    logger = logging.getLogger()
+    logger.handlers = [QueueHandler(log_queue)]
+    logger.setLevel(logging.INFO)
+
 def main():
+    root = None
     try:
         setup_logging()
+
+        # 全ダイアログで共有する非表示のメインウィンドウ
+        root = tk.Tk()
+        root.withdraw()
         
         # コマンドライン引数の取得とチェック
         dxf_files = sys.argv[1:] if len(sys.argv) > 1 else []
         
         if not dxf_files:
             # GUIモード
-            root = tk.Tk()
-            root.withdraw()
             dxf_files = filedialog.askopenfilenames(
+                parent=root,
                 title="DXFファイルを選択",
                 filetypes=[("DXF files", "*.dxf"), ("All files", "*.*")]
             )
-            root.destroy()
         
         if not dxf_files:
             logging.error("ファイルが選択されませんでした")
@@ -574,23 +790,59 @@ def main():
                 raise FileNotFoundError(f"ファイルが見つかりません: {dxf_path}")
         
         # 入力座標系の選択
-        epsg = EPSGSelector().get_epsg()
-        logging.info(f"選択座標系: EPSG:{epsg}")
+        epsg = EPSGSelector(root).get_epsg()
+        logging.info("選択座標系: EPSG:%s", epsg)
 
         # 出力座標系の選択
-        output_crs = OutputCRSSelector(epsg).get_crs()
-        logging.info(f"出力座標系: {output_crs}")
-
-        # 各ファイルを処理
-        for dxf_path in dxf_files:
-            process_dxf_file(dxf_path, epsg, output_crs)
+        crs_selector = OutputCRSSelector(epsg, root)
+        output_crs = crs_selector.get_crs()
+        force_2d = crs_selector.force_2d
+        compress = crs_selector.compress
+        logging.info("出力座標系: %s（2次元出力: %s, gzip圧縮: %s）", output_crs, force_2d, compress)
+
+        # 各ファイルを処理（複数ファイルはプロセスごとに並列処理）
+        n = len(dxf_files)
+        if n == 1:
+            output_paths = [
+                process_dxf_file(dxf_files[0], epsg, output_crs, force_2d=force_2d,
+                                 compress=compress)
+            ]
+        else:
+            max_workers = min(n, os.cpu_count() or 1)
+            # ワーカーのログはキュー経由でメインプロセスのハンドラーへ出力
+            log_queue = multiprocessing.Queue()
+            listener = QueueListener(log_queue, *logging.getLogger().handlers)
+            listener.start()
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                         initargs=(log_queue,)) as executor:
+                    futures = [
+                        executor.submit(process_dxf_file, dxf_path, epsg, output_crs,
+                                        force_2d=force_2d, compress=compress)
+                        for dxf_path in dxf_files
+                    ]
+                    for future in as_completed(futures):
+                        future.result()
+                    # 出力ファイルは入力ファイルの順に並べる
+                    output_paths = [future.result() for future in futures]
+            finally:
+                listener.stop()
             
         logging.info("すべての処理が完了しました")
-        messagebox.showinfo("完了", "すべての処理が完了しました")
+        message = "すべての処理が完了しました"
+        output_paths = [path for path in output_paths if path]
+        if output_paths:
+            message += "\n\n出力ファイル:\n" + "\n".join(output_paths)
+        messagebox.showinfo("完了", message)
         
     except Exception as e:
-        logging.critical(f"致命的エラー: {str(e)}", exc_info=True)
+        logging.critical("致命的エラー: %s", e, exc_info=True)
         messagebox.showerror("エラー", str(e))
 
+    finally:
+        if root is not None:
+            root.destroy()
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # PyInstaller実行ファイルでのワーカー起動用
     main()